@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+import io
 import os
-from datetime import datetime
+import hashlib
+import tempfile
+from datetime import date, datetime
 
 # -------------------
 # PAGE CONFIG
@@ -42,10 +48,64 @@ uploaded_file = st.sidebar.file_uploader(
 # -------------------
 # DATA PROCESSING FUNCTION
 # -------------------
-@st.cache_data
-def load_and_process_click_data(file):
-    df = pd.read_excel(file)
+# Source columns the dashboard reads; everything else is skipped while parsing
+USED_COLUMNS = [
+    "Contestant id", "Name", "gender", "Location", "number of clicks/ points",
+    "Date of Participation", "Profile Creation Date", "Age"
+]
 
+# Processed frames are persisted here as Feather, keyed by the source file's hash,
+# so a cold start skips the xlsx parse. Bump the version whenever processing changes.
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "click_cache")
+CACHE_VERSION = 9
+
+def file_digest(file):
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    return hashlib.sha1(file.getbuffer()).hexdigest()
+
+def read_cached_frame(path):
+    # A missing, truncated or otherwise unreadable sidecar just means a re-parse
+    try:
+        return pd.read_feather(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, pa.ArrowException):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+def write_cached_frame(df, path):
+    # Write to a temp file and rename it into place, so readers never see a partial file;
+    # a failed write only costs a re-parse next time
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        df.to_feather(tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException):
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return
+
+    # Sidecars from older CACHE_VERSIONs can never be read again
+    current_suffix = f"-v{CACHE_VERSION}.feather"
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".feather") and not name.endswith(current_suffix):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+
+def process_click_data(df):
     # Rename columns
     df = df.rename(columns={
         "Contestant id": "user_id",
@@ -54,19 +114,57 @@ def load_and_process_click_data(file):
         "Location": "location",
         "number of clicks/ points": "num_clicks",
         "Date of Participation": "date_participated",
-        "Profile Creation Date": "profile_creation_date",
-        "Device/Browser Info": "device",
-        "rank": "provided_rank"
+        "Profile Creation Date": "profile_creation_date"
     })
 
+    # Drop anything the dashboard doesn't use so every later scan and copy stays narrow
+    keep = ['user_id', 'name', 'gender', 'location', 'num_clicks', 'date_participated', 'profile_creation_date']
+    if 'Age' in df.columns:
+        keep.append('Age')
+    df = df[keep].copy()
+
     # Fix data types
+    df['user_id'] = df['user_id'].astype(str).astype('category')
     df['date_participated'] = pd.to_datetime(df['date_participated'], errors='coerce')
     df['profile_creation_date'] = pd.to_datetime(df['profile_creation_date'], errors='coerce')
-    df['num_clicks'] = pd.to_numeric(df['num_clicks'], errors='coerce').fillna(0).astype(int)
-
-    # Ranking
+    # Participation day as int64 days since epoch, so the date filter is a plain integer compare
+    df['date_day'] = df['date_participated'].values.astype('datetime64[D]').view('i8')
+    df['num_clicks'] = pd.to_numeric(df['num_clicks'], errors='coerce').fillna(0).astype('int32')
+    # Age goes into Arrow tables as-is, so stray text must not leave it a mixed-type column
+    if 'Age' in df.columns:
+        df['Age'] = pd.to_numeric(df['Age'], errors='coerce')
+    # Low-cardinality labels: filters and groupbys work on integer codes
+    df['gender'] = df['gender'].astype('category')
+    df['location'] = df['location'].astype('category')
+    # Free-text names are Arrow-backed, so string ops and st.dataframe transfer skip Python objects
+    df['name'] = df['name'].astype('string[pyarrow]')
+
+    # Ranking: rows are sorted by clicks, so a row's rank is the position where its run of ties starts
     df = df.sort_values('num_clicks', ascending=False)
-    df['rank'] = df['num_clicks'].rank(method='min', ascending=False).astype(int)
+    clicks = df['num_clicks'].values
+    run_start = np.ones(len(clicks), dtype=bool)
+    run_start[1:] = clicks[1:] != clicks[:-1]
+    positions = np.arange(1, len(clicks) + 1, dtype=np.int32)
+    df['rank'] = np.maximum.accumulate(np.where(run_start, positions, 0))
+    df = df.reset_index(drop=True)
+
+    return df
+
+@st.cache_data
+def load_and_process_click_data(file):
+    digest = file_digest(file)
+    cache_path = os.path.join(CACHE_DIR, f"{digest}-v{CACHE_VERSION}.feather")
+    df = read_cached_frame(cache_path)
+    if df is None:
+        # calamine (Rust) parses xlsx much faster than the default openpyxl engine
+        df = process_click_data(pd.read_excel(file, engine="calamine", usecols=lambda col: col in USED_COLUMNS))
+        write_cached_frame(df, cache_path)
+
+    # Source hash plus date filter bounds, kept on the frame so reruns don't rescan anything.
+    # Dates are ISO strings because attrs get written into Arrow schema metadata as JSON.
+    df.attrs['digest'] = digest
+    df.attrs['date_min'] = df['date_participated'].min().date().isoformat()
+    df.attrs['date_max'] = df['date_participated'].max().date().isoformat()
 
     return df
 
@@ -97,22 +195,26 @@ else:
 st.sidebar.header("🔍 Filters")
 
 # Date filter
-date_min = df['date_participated'].min().date()
-date_max = df['date_participated'].max().date()
+date_min = date.fromisoformat(df.attrs['date_min'])
+date_max = date.fromisoformat(df.attrs['date_max'])
 selected_dates = st.sidebar.date_input("Date range", [date_min, date_max], min_value=date_min, max_value=date_max)
 
+# Categories are already sorted and NaN-free, so they double as the option lists
+location_options = df['location'].cat.categories.tolist()
+gender_options = df['gender'].cat.categories.tolist()
+
 # Location filter
 locations = st.sidebar.multiselect(
     "Select Locations",
-    options=sorted(df['location'].dropna().unique()),
-    default=sorted(df['location'].dropna().unique())
+    options=location_options,
+    default=location_options
 )
 
 # Gender filter
 genders = st.sidebar.multiselect(
     "Select Gender",
-    options=sorted(df['gender'].dropna().unique()),
-    default=sorted(df['gender'].dropna().unique())
+    options=gender_options,
+    default=gender_options
 )
 
 # Rank filter
@@ -120,20 +222,100 @@ rank_min = int(df['rank'].min())
 rank_max = int(df['rank'].max())
 rank_range = st.sidebar.slider("Select Rank Range", min_value=rank_min, max_value=rank_max, value=(rank_min, rank_max))
 
-# Apply filters
-filtered_df = df[
-    (df['date_participated'].dt.date >= selected_dates[0]) &
-    (df['date_participated'].dt.date <= selected_dates[1]) &
-    (df['location'].isin(locations)) &
-    (df['gender'].isin(genders)) &
-    (df['rank'] >= rank_range[0]) &
-    (df['rank'] <= rank_range[1])
-]
+# Apply filters in a single fused pass
+d0, d1 = (np.datetime64(d, 'D').view('i8') for d in selected_dates)
+rmin, rmax = rank_range
+filtered_df = df.query(
+    "@d0 <= date_day <= @d1 and location in @locations and gender in @genders and @rmin <= rank <= @rmax",
+    engine='numexpr'
+)
 
 if filtered_df.empty:
     st.warning("No data matches the selected filters.")
     st.stop()
 
+# -------------------
+# CACHED AGGREGATIONS
+# -------------------
+# Keyed on the source file and the filter values; the underscore keeps Streamlit from hashing the frame.
+# These caches are process-wide and every filter combination from every session adds an entry, so
+# they are bounded; the two holding a full copy of the filtered frame also expire.
+FILTER_CACHE_ENTRIES = 32
+FRAME_CACHE_TTL = "10m"
+
+filter_key = (df.attrs['digest'], tuple(selected_dates), tuple(locations), tuple(genders), tuple(rank_range))
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_overview(filter_key, _filtered_df):
+    clicks = _filtered_df['num_clicks'].to_numpy()
+    # Dense month codes let bincount do the monthly sum; months without rows are dropped
+    months = _filtered_df['date_participated'].values.astype('datetime64[M]')
+    codes = (months.view('i8') - months.view('i8').min()).astype(np.intp)
+    totals = np.bincount(codes, weights=clicks).astype(np.int64)
+    present = np.bincount(codes) > 0
+    monthly_clicks = pd.DataFrame({
+        'month': (months.min() + np.arange(totals.size))[present].astype(str),
+        'num_clicks': totals[present],
+    })
+    # The monthly totals already add up to the overall total, so only max needs another scan
+    total_clicks = int(totals.sum())
+    return {
+        'total_clicks': total_clicks,
+        'total_contestants': _filtered_df['user_id'].nunique(),
+        'avg_clicks': total_clicks / len(clicks),
+        'max_clicks': int(clicks.max()),
+        'monthly_clicks': monthly_clicks,
+    }
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_leaderboard(filter_key, _filtered_df):
+    top_contestants = pa.Table.from_pandas(_filtered_df.nsmallest(20, 'rank'),
+                                           columns=['rank', 'name', 'gender', 'location', 'num_clicks'], preserve_index=False)
+    gender_clicks = _filtered_df.groupby('gender', observed=True)['num_clicks'].sum().reset_index()
+    return top_contestants, gender_clicks
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_demographics(filter_key, _filtered_df):
+    loc_df = _filtered_df.groupby('location', observed=True)['num_clicks'].sum().reset_index()
+    # Histogram of the categorical codes (-1 marks a missing gender); unseen genders are dropped
+    categories = _filtered_df['gender'].cat.categories
+    codes = _filtered_df['gender'].cat.codes.values
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    gender_counts = pd.DataFrame({'gender': categories, 'count': counts})
+    gender_counts = gender_counts[gender_counts['count'] > 0].sort_values('count', ascending=False)
+    return loc_df.sort_values('num_clicks', ascending=False), gender_counts
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def compute_clicks_histogram(filter_key, _filtered_df, nbins=30):
+    # Bin counts and box-plot statistics per gender, so the chart ships a few numbers instead of every row
+    clicks = _filtered_df['num_clicks'].to_numpy()
+    edges = np.histogram_bin_edges(clicks, bins=nbins, range=(clicks.min(), clicks.max()))
+    series = []
+    for gender in _filtered_df['gender'].unique().dropna():
+        values = clicks[(_filtered_df['gender'] == gender).to_numpy()]
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        iqr = q3 - q1
+        series.append({
+            'gender': gender,
+            'counts': np.histogram(values, bins=edges)[0],
+            'q1': q1, 'median': median, 'q3': q3,
+            'lowerfence': values[values >= q1 - 1.5 * iqr].min(),
+            'upperfence': values[values <= q3 + 1.5 * iqr].max(),
+        })
+    return edges, series
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL)
+def compute_raw_table(filter_key, _filtered_df, columns):
+    # st.dataframe ships Arrow to the frontend; converting once here saves it on every rerun
+    return pa.Table.from_pandas(_filtered_df, columns=columns, preserve_index=False)
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, ttl=FRAME_CACHE_TTL)
+def make_csv(filter_key, _filtered_df, columns):
+    # Write the CSV straight into a byte buffer instead of building a str and re-encoding it
+    csv_buffer = io.BytesIO()
+    _filtered_df.to_csv(csv_buffer, index=False, columns=columns, encoding='utf-8')
+    return csv_buffer.getvalue()
+
 # -------------------
 # TABS
 # -------------------
@@ -142,10 +324,11 @@ tabs = st.tabs(["Overview", "Leaderboard", "Clicks Analysis", "Demographics", "R
 # --- TAB 1: Overview ---
 with tabs[0]:
     st.header("🎯 Competition Overview")
-    total_clicks = filtered_df['num_clicks'].sum()
-    total_contestants = filtered_df['user_id'].nunique()
-    avg_clicks = filtered_df['num_clicks'].mean()
-    max_clicks = filtered_df['num_clicks'].max()
+    overview = compute_overview(filter_key, filtered_df)
+    total_clicks = overview['total_clicks']
+    total_contestants = overview['total_contestants']
+    avg_clicks = overview['avg_clicks']
+    max_clicks = overview['max_clicks']
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total Clicks", f"{total_clicks:,}")
@@ -153,9 +336,7 @@ with tabs[0]:
     col3.metric("Average Clicks per Contestant", f"{avg_clicks:.1f}")
     col4.metric("Max Clicks", f"{max_clicks:,}")
 
-    trend_df = filtered_df.copy()
-    trend_df['month'] = trend_df['date_participated'].dt.to_period('M').astype(str)
-    monthly_clicks = trend_df.groupby('month')['num_clicks'].sum().reset_index()
+    monthly_clicks = overview['monthly_clicks']
 
     # Simpler bar chart with values on bars
     fig_trend = px.bar(
@@ -174,13 +355,10 @@ with tabs[0]:
 with tabs[1]:
     st.header("🏆 Leaderboard")
     st.write("Top 20 contestants by clicks")
-    st.dataframe(
-        filtered_df.sort_values('rank').head(20)[['rank', 'name', 'gender', 'location', 'num_clicks']],
-        use_container_width=True
-    )
+    top_contestants, gender_clicks = compute_leaderboard(filter_key, filtered_df)
+    st.dataframe(top_contestants, use_container_width=True)
     
     # Simpler aggregated bar chart for clicks by gender
-    gender_clicks = filtered_df.groupby('gender')['num_clicks'].sum().reset_index()
     fig_gender = px.bar(
         gender_clicks,
         x='gender',
@@ -197,7 +375,20 @@ with tabs[1]:
 # --- TAB 3: Clicks Analysis ---
 with tabs[2]:
     st.header("📈 Clicks Performance Analysis")
-    fig_hist = px.histogram(filtered_df, x='num_clicks', nbins=30, color='gender', marginal='box', title="Clicks Histogram by Gender")
+    edges, hist_series = compute_clicks_histogram(filter_key, filtered_df)
+    fig_hist = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    colors = px.colors.qualitative.Plotly
+    for i, hist in enumerate(hist_series):
+        color = colors[i % len(colors)]
+        fig_hist.add_trace(go.Box(q1=[hist['q1']], median=[hist['median']], q3=[hist['q3']],
+                                  lowerfence=[hist['lowerfence']], upperfence=[hist['upperfence']],
+                                  y=[hist['gender']], orientation='h', name=hist['gender'],
+                                  legendgroup=hist['gender'], showlegend=False, marker_color=color), row=1, col=1)
+        fig_hist.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=hist['counts'], width=np.diff(edges),
+                                  name=hist['gender'], legendgroup=hist['gender'], marker_color=color), row=2, col=1)
+    fig_hist.update_layout(title="Clicks Histogram by Gender", barmode='relative', bargap=0, legend_title_text='gender')
+    fig_hist.update_xaxes(title_text='num_clicks', row=2, col=1)
+    fig_hist.update_yaxes(title_text='count', row=2, col=1)
     st.plotly_chart(fig_hist, use_container_width=True)
 
     if 'Age' in filtered_df.columns:
@@ -210,26 +401,27 @@ with tabs[2]:
 # --- TAB 4: Demographics ---
 with tabs[3]:
     st.header("🌍 Demographics and Location Analysis")
-    loc_df = filtered_df.groupby('location')['num_clicks'].sum().reset_index()
-    fig_loc = px.bar(loc_df.sort_values('num_clicks', ascending=False), x='location', y='num_clicks',
+    loc_df, gender_counts = compute_demographics(filter_key, filtered_df)
+    fig_loc = px.bar(loc_df, x='location', y='num_clicks',
                      title='Total Clicks by Location')
     st.plotly_chart(fig_loc, use_container_width=True)
 
-    gender_counts = filtered_df['gender'].value_counts().reset_index()
-    gender_counts.columns = ['gender', 'count']
     fig_pie = px.pie(gender_counts, names='gender', values='count', title='Contestants by Gender')
     st.plotly_chart(fig_pie, use_container_width=True)
 
 # --- TAB 5: Raw Data ---
 with tabs[4]:
     st.header("📋 Raw Data")
-    st.dataframe(filtered_df, use_container_width=True)
+    # Hide the loader's helper columns from the table and the export
+    raw_columns = [col for col in filtered_df.columns if col != 'date_day']
+    st.dataframe(compute_raw_table(filter_key, filtered_df, raw_columns), use_container_width=True)
 
     if "download_count" not in st.session_state:
         st.session_state["download_count"] = 0
 
-    csv = filtered_df.to_csv(index=False).encode('utf-8')
-    if st.download_button(label="Download filtered data as CSV", data=csv,
+    # The CSV is only serialized when the button is clicked, then reused until the filters change
+    if st.download_button(label="Download filtered data as CSV",
+                          data=lambda: make_csv(filter_key, filtered_df, raw_columns),
                           file_name='filtered_click_competition_data.csv', mime='text/csv'):
         st.session_state["download_count"] += 1
     st.write(f"📥 You have downloaded the CSV {st.session_state['download_count']} times this session.")